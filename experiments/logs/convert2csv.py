@@ -1,13 +1,21 @@
 import csv
 import os
+import re
 
-def convert_to_csv(input_file_path):
+import numpy as np
+
+# Fields may be separated by commas, whitespace, or both (e.g. "0.1, 0.2, 0.3, 0.4")
+_SEP = re.compile(r'[,\s]+')
+
+def convert_to_csv(input_file_path, validate=False):
     """
     Reads a file with space-separated or comma-separated values on each line,
     and saves it as a CSV file with a header.
 
     Args:
         input_file_path (str): The path to the input file.
+        validate (bool): In the line-by-line path, convert each value to float before writing
+            (warning on non-numeric lines). Otherwise fields are written as-is.
     """
     if not os.path.exists(input_file_path):
         print(f"Error: Input file not found at {input_file_path}")
@@ -20,31 +28,48 @@ def convert_to_csv(input_file_path):
     header = ['xyz_magnitude', 'xyz_cosine_similarity', 'rot_magnitude', 'rot_cosine_similarity']
 
     try:
-        with open(input_file_path, 'r') as infile, open(output_file_path, 'w', newline='') as outfile:
+        # Fast path: parse and write the whole file in one vectorized pass
+        try:
+            try:
+                arr = np.loadtxt(input_file_path, delimiter=',', ndmin=2)
+            except ValueError:
+                arr = np.loadtxt(input_file_path, delimiter=None, ndmin=2)
+        except ValueError:
+            arr = None  # Malformed lines, fall back to the line-by-line parser below
+
+        if arr is not None and arr.shape[1] == len(header):
+            np.savetxt(output_file_path, arr, delimiter=',', header=','.join(header), comments='', fmt='%.6g',
+                       newline='\r\n')
+            print(f"Successfully converted '{input_file_path}' to '{output_file_path}'")
+            return
+
+        # Read the whole file at once and split each line with a precompiled regex
+        with open(input_file_path, 'r') as infile:
+            lines = infile.read().splitlines()
+
+        rows = []
+        for line_number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:  # Skip empty lines
+                continue
+
+            values = _SEP.split(line)
+            if len(values) != 4:
+                print(f"Warning: Line {line_number} does not contain 4 values: {line}. Skipping.")
+            elif not validate:
+                rows.append(values)
+            else:
+                try:
+                    # Attempt to convert to float to ensure data integrity, though not strictly necessary for just writing
+                    rows.append([float(v) for v in values])
+                except ValueError:
+                    print(f"Warning: Could not convert values to float on line {line_number}: {line}. Writing as is.")
+                    rows.append(values) # Write original string values if conversion fails
+
+        with open(output_file_path, 'w', newline='') as outfile:
             csv_writer = csv.writer(outfile)
             csv_writer.writerow(header)
-
-            for line_number, line in enumerate(infile, 1):
-                line = line.strip()
-                if not line:  # Skip empty lines
-                    continue
-
-                # Attempt to split by comma first, then by space if comma fails or gives wrong number of fields
-                values = [v.strip() for v in line.split(',')]
-                if len(values) != 4: # If comma splitting didn't yield 4 values, try splitting by space
-                    values = [v.strip() for v in line.split()]
-
-
-                if len(values) == 4:
-                    try:
-                        # Attempt to convert to float to ensure data integrity, though not strictly necessary for just writing
-                        float_values = [float(v) for v in values]
-                        csv_writer.writerow(float_values)
-                    except ValueError:
-                        print(f"Warning: Could not convert values to float on line {line_number}: {line}. Writing as is.")
-                        csv_writer.writerow(values) # Write original string values if conversion fails
-                else:
-                    print(f"Warning: Line {line_number} does not contain 4 values: {line}. Skipping.")
+            csv_writer.writerows(rows)
 
         print(f"Successfully converted '{input_file_path}' to '{output_file_path}'")
 
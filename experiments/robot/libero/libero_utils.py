@@ -58,12 +58,17 @@ def get_libero_image(obs, resize_size):
     return img
 
 
-def save_rollout_video(rollout_images, idx, success, task_description, log_file=None):
-    """Saves an MP4 replay of an episode."""
+def get_rollout_video_path(idx, success, task_description):
+    """Returns the MP4 path for the replay of an episode (creating the rollout directory if needed)."""
     rollout_dir = f"./rollouts/{DATE}"
     os.makedirs(rollout_dir, exist_ok=True)
     processed_task_description = task_description.lower().replace(" ", "_").replace("\n", "_").replace(".", "_")[:50]
-    mp4_path = f"{rollout_dir}/{DATE_TIME}--episode={idx}--success={success}--task={processed_task_description}.mp4"
+    return f"{rollout_dir}/{DATE_TIME}--episode={idx}--success={success}--task={processed_task_description}.mp4"
+
+
+def save_rollout_video(rollout_images, idx, success, task_description, log_file=None):
+    """Saves an MP4 replay of an episode."""
+    mp4_path = get_rollout_video_path(idx, success, task_description)
     video_writer = imageio.get_writer(mp4_path, fps=30)
     for img in rollout_images:
         video_writer.append_data(img)
@@ -74,6 +79,29 @@ def save_rollout_video(rollout_images, idx, success, task_description, log_file=
     return mp4_path
 
 
+def open_rollout_video_writer(idx, task_description):
+    """
+    Opens a streaming MP4 writer for the replay of an episode, so that frames are encoded as they are produced
+    instead of being buffered in memory. Returns the writer and the temporary path it writes to; the episode
+    outcome is not known yet, so the file is renamed by `finalize_rollout_video()`.
+    """
+    mp4_path = get_rollout_video_path(idx, "pending", task_description)
+    video_writer = imageio.get_writer(mp4_path, fps=30)
+    return video_writer, mp4_path
+
+
+def finalize_rollout_video(video_writer, tmp_mp4_path, idx, success, task_description, log_file=None):
+    """Closes a writer from `open_rollout_video_writer()` and moves the MP4 to its final path."""
+    video_writer.close()
+    mp4_path = get_rollout_video_path(idx, success, task_description)
+    if os.path.exists(tmp_mp4_path):  # The ffmpeg writer only creates the file once a frame has been appended
+        os.replace(tmp_mp4_path, mp4_path)
+    print(f"Saved rollout MP4 at path {mp4_path}")
+    if log_file is not None:
+        log_file.write(f"Saved rollout MP4 at path {mp4_path}\n")
+    return mp4_path
+
+
 def quat2axisangle(quat):
     """
     Copied from robosuite: https://github.com/ARISE-Initiative/robosuite/blob/eafb81f54ffc104f905ee48a16bb15f059176ad3/robosuite/utils/transform_utils.py#L490C1-L512C55
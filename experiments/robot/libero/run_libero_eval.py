@@ -17,34 +17,30 @@ Usage:
         --wandb_entity <ENTITY>
 """
 
+import json
+import math
 import os
 import sys
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional, Union
-import random
-import time
 
+import cv2
 import draccus
 import numpy as np
-from PIL import Image, ImageDraw, ImageFont
 import tqdm
 from libero.libero import benchmark
-from rich import print as rprint
-from peft import PeftModel, PeftConfig
 import wandb
-import copy
-import pdb
-import json
 
 # Append current directory so that interpreter can find experiments.robot
 sys.path.append("../..")
 from experiments.robot.libero.libero_utils import (
+    finalize_rollout_video,
     get_libero_dummy_action,
     get_libero_env,
     get_libero_image,
+    open_rollout_video_writer,
     quat2axisangle,
-    save_rollout_video,
 )
 from experiments.robot.openvla_utils import get_processor
 from experiments.robot.robot_utils import (
@@ -57,6 +53,19 @@ from experiments.robot.robot_utils import (
     set_seed_everywhere,
 )
 
+# Maximum number of rollout steps per task suite
+MAX_STEPS = {
+    "libero_spatial": 220,  # longest training demo has 193 steps
+    "libero_object": 280,  # longest training demo has 254 steps
+    "libero_goal": 300,  # longest training demo has 270 steps
+    "libero_10": 520,  # longest training demo has 505 steps
+    "libero_90": 400,  # longest training demo has 373 steps
+}
+
+# Step counter overlay drawn on each frame
+TEXT_POS = (10, 30)  # Bottom-left corner of the text (cv2 anchors text at its baseline)
+TEXT_COLOR = (255, 255, 255)
+
 
 @dataclass
 class GenerateConfig:
@@ -154,14 +163,26 @@ def eval_libero(cfg: GenerateConfig) -> None:
     # Get expected image dimensions
     resize_size = get_image_resize_size(cfg)
 
+    # Get maximum episode length for the task suite
+    max_steps = MAX_STEPS[cfg.task_suite_name]
+
+    # Read config values used on every rollout step into locals once
+    num_steps_wait = cfg.num_steps_wait
+    invert_gripper = cfg.model_family == "openvla"
+    dummy_action = get_libero_dummy_action(cfg.model_family)
+
+    # ----- Begin of qyjh Inserted Code -----
+    motion_trace_path = os.path.join(os.path.expanduser("~/openvla/experiments/logs"), "motion_trace.out")
+    # ----- End of qyjh Inserted Code -----
+
     # Start evaluation
     total_episodes, total_successes = 0, 0
     cnt = 0
+    # ----- Begin of qyjh Inserted Code -----
+    task_logs = {}  # Per-task success counts keyed by task description, flushed to JSON once per task
+    # ----- End of qyjh Inserted Code -----
     for task_id in tqdm.tqdm(range(num_tasks_in_suite)):
         # Get task
-        # ----- Begin of qyjh Inserted Code -----
-        task_id=0
-        # ----- End of qyjh Inserted Code -----
         task = task_suite.get_task(task_id)
 
         # Get default LIBERO initial states
@@ -170,16 +191,27 @@ def eval_libero(cfg: GenerateConfig) -> None:
         # Initialize LIBERO environment and task description
         env, task_description = get_libero_env(task, cfg.model_family, resolution=256)
 
+        # ----- Begin of qyjh Inserted Code -----
+        task_log_path = os.path.expanduser(f"~/openvla/experiments/logs/{task_description}_log.json")
+        if task_description not in task_logs:
+            if os.path.exists(task_log_path):
+                with open(task_log_path, "r") as f:
+                    task_logs[task_description] = json.load(f)
+            else:
+                task_logs[task_description] = {}
+        data = task_logs[task_description]
+        # ----- End of qyjh Inserted Code -----
+
         # Start episodes
         task_episodes, task_successes = 0, 0
         total_steps = 0
         for episode_idx in tqdm.tqdm(range(cfg.num_trials_per_task)):
             # ----- Begin of qyjh Inserted Code -----
-            random.seed(int(time.time()))
             # scale = random.choice([[20,60], [60,100], [100,140]])
             # ber = round(random.choice([0.1 * i for i in range(1, 6)]), 1)
             scale=[]
             ber = 0
+            scale_key, ber_key = str(scale), str(ber)
             # ----- End of qyjh Inserted Code -----
             print(f"\nTask: {task_description}")
             log_file.write(f"\nTask: {task_description}\n")
@@ -192,27 +224,18 @@ def eval_libero(cfg: GenerateConfig) -> None:
 
             # Setup
             t = 0
-            replay_images = []
+            video_writer, video_path = open_rollout_video_writer(total_episodes + 1, task_description)
             action_previous = None
-            if cfg.task_suite_name == "libero_spatial":
-                max_steps = 220  # longest training demo has 193 steps
-            elif cfg.task_suite_name == "libero_object":
-                max_steps = 280  # longest training demo has 254 steps
-            elif cfg.task_suite_name == "libero_goal":
-                max_steps = 300  # longest training demo has 270 steps
-            elif cfg.task_suite_name == "libero_10":
-                max_steps = 520  # longest training demo has 505 steps
-            elif cfg.task_suite_name == "libero_90":
-                max_steps = 400  # longest training demo has 373 steps
+            motion_log_buf = []  # Buffered motion trace entries, flushed once at episode end
 
             print(f"Starting episode {task_episodes+1}...")
             log_file.write(f"Starting episode {task_episodes+1}...\n")
-            while t < max_steps + cfg.num_steps_wait:
+            while t < max_steps + num_steps_wait:
                 try:
                     # IMPORTANT: Do nothing for the first few timesteps because the simulator drops objects
                     # and we need to wait for them to fall
-                    if t < cfg.num_steps_wait:
-                        obs, reward, done, info = env.step(get_libero_dummy_action(cfg.model_family))
+                    if t < num_steps_wait:
+                        obs, reward, done, info = env.step(dummy_action)
                         t += 1
                         continue
 
@@ -220,21 +243,12 @@ def eval_libero(cfg: GenerateConfig) -> None:
                     img = get_libero_image(obs, resize_size)
 
                     # ----- Begin of qyjh Inserted Code -----
-                    img_pil = Image.fromarray(img)
-                    draw = ImageDraw.Draw(img_pil)
-                    try:
-                        font = ImageFont.truetype("arial.ttf", 20)
-                    except IOError:
-                        font = ImageFont.load_default()
-
-                    text_to_display = f"Step: {t}"
-                    text_color = (255, 255, 255)
-                    text_position = (10, 10)
-                    draw.text(text_position, text_to_display, fill=text_color, font=font)
-                    img = np.array(img_pil)
+                    # Draw the step counter directly on the uint8 array (no PIL round-trip / extra frame copies)
+                    img = np.require(img, dtype=np.uint8, requirements=["C", "W"])
+                    cv2.putText(img, f"Step: {t}", TEXT_POS, cv2.FONT_HERSHEY_SIMPLEX, 0.6, TEXT_COLOR, 1, cv2.LINE_AA)
                     # ----- End of qyjh Inserted Code -----
-                    # Save preprocessed image for replay video
-                    replay_images.append(img)
+                    # Stream preprocessed image to the replay video
+                    video_writer.append_data(img)
 
                     # Prepare observations dict
                     # Note: OpenVLA does not take proprio state as input
@@ -260,33 +274,32 @@ def eval_libero(cfg: GenerateConfig) -> None:
                     replan = False
                     if replan:
                         if action_previous is None:
-                            action_previous = np.array(copy.deepcopy(action).tolist())
-                            actions_previous_xyz = action_previous[0:3]
-                            actions_previous_rot = action_previous[3:6]
+                            action_previous = np.asarray(action, dtype=np.float64).copy()
+                            actions_previous_xyz = action_previous[0:3].tolist()
+                            actions_previous_rot = action_previous[3:6].tolist()
                         else:
-                            action_now = np.array(copy.deepcopy(action).tolist())
-                            actions_xyz = action_now[0:3]
-                            actions_rot = action_now[3:6]
-                            xyz_fudu = np.linalg.norm(actions_xyz, ord=2)
-                            rot_fudu = np.linalg.norm(actions_rot, ord=2)
-                            previous_xyz_fudu = np.linalg.norm(actions_previous_xyz, ord=2)
-                            previous_rot_fudu = np.linalg.norm(actions_previous_rot, ord=2)
-
-                            xyz_changes_dir = min(np.dot(actions_xyz, actions_previous_xyz)/(xyz_fudu * previous_xyz_fudu+1e-6), 1)
-                            rot_changes_dir = min(np.dot(actions_rot, actions_previous_rot)/(rot_fudu * previous_rot_fudu+1e-6), 1)
+                            action_now = np.asarray(action, dtype=np.float64).copy()
+                            # 3-vectors are handled as Python floats; ndarray / BLAS dispatch dominates at this size
+                            actions_xyz = action_now[0:3].tolist()
+                            actions_rot = action_now[3:6].tolist()
+                            xyz_fudu = math.hypot(*actions_xyz)
+                            rot_fudu = math.hypot(*actions_rot)
+                            previous_xyz_fudu = math.hypot(*actions_previous_xyz)
+                            previous_rot_fudu = math.hypot(*actions_previous_rot)
+                            xyz_dot = sum(a * b for a, b in zip(actions_xyz, actions_previous_xyz))
+                            rot_dot = sum(a * b for a, b in zip(actions_rot, actions_previous_rot))
+
+                            xyz_changes_dir = min(xyz_dot / (xyz_fudu * previous_xyz_fudu + 1e-6), 1.0)
+                            rot_changes_dir = min(rot_dot / (rot_fudu * previous_rot_fudu + 1e-6), 1.0)
 
                             
                             # ----- Begin of qyjh Inserted Code -----
-                            dir_path = os.path.expanduser("~/openvla/experiments/logs")
-                            motion_trace_path = os.path.join(dir_path, "motion_trace.out")
-                            log_entry = (
+                            motion_log_buf.append(
                                 f"{xyz_fudu:.4f}, {xyz_changes_dir:.4f}, {rot_fudu:.4f}, {rot_changes_dir:.4f}\n"
                             )
-                            with open(motion_trace_path, "a") as f:
-                                f.write(log_entry)
                             # ----- End of qyjh Inserted Code -----
                             # if xyz_changes_dir < -0.1 or rot_changes_dir < -0.1 or xyz_fudu<0.04 or rot_fudu<0.04:
-                            #     exit_state = copy.deepcopy(model.language_model.model.multi_exit)
+                            #     exit_state = model.language_model.model.multi_exit  # plain bool, no deepcopy needed
                             #     model.language_model.model.multi_exit = False
                             #     action = get_action(
                             #         cfg,
@@ -298,16 +311,16 @@ def eval_libero(cfg: GenerateConfig) -> None:
                             #     model.language_model.model.multi_exit = exit_state
                             #     model.language_model.model.replan_num += 1
                             
-                            action_previous = np.array(copy.deepcopy(action).tolist())
-                            actions_previous_xyz = action_previous[0:3]
-                            actions_previous_rot = action_previous[3:6]
+                            action_previous = np.asarray(action, dtype=np.float64).copy()
+                            actions_previous_xyz = action_previous[0:3].tolist()
+                            actions_previous_rot = action_previous[3:6].tolist()
 
                     # Normalize gripper action [0,1] -> [-1,+1] because the environment expects the latter
                     action = normalize_gripper_action(action, binarize=True)
 
                     # [OpenVLA] The dataloader flips the sign of the gripper action to align with other datasets
                     # (0 = close, 1 = open), so flip it back (-1 = open, +1 = close) before executing the action
-                    if cfg.model_family == "openvla":
+                    if invert_gripper:
                         action = invert_gripper_action(action)
                     gripper_action = action
                     # cnt += 1
@@ -337,31 +350,24 @@ def eval_libero(cfg: GenerateConfig) -> None:
             total_episodes += 1
 
             # ----- Begin of qyjh Inserted Code -----
-            file_path = os.path.expanduser(f"~/openvla/experiments/logs/{task_description}_log.json")
-            if os.path.exists(file_path):
-                with open(file_path, 'r') as f:
-                    data = json.load(f)
-            else:
-                data = {}
-            
-            if str(scale) not in data:
-                data[str(scale)] = {}
-            if str(ber) not in data[str(scale)]:
-                data[str(scale)][str(ber)] = {
-                    "total_times": 0,
-                    "success_times": 0
-                }
-            data[str(scale)][str(ber)]["total_times"] += 1
-            if done:
-                data[str(scale)][str(ber)]["success_times"] += 1
+            # Flush buffered motion trace with a single open/write instead of one per step
+            if motion_log_buf:
+                with open(motion_trace_path, "a", buffering=1 << 16) as f:
+                    f.writelines(motion_log_buf)
 
-            with open(file_path, 'w') as f:
-                json.dump(data, f, indent=4)
+            counts = data.setdefault(scale_key, {}).setdefault(ber_key, {"total_times": 0, "success_times": 0})
+            counts["total_times"] += 1
+            counts["success_times"] += int(done)
 
             # ----- End of qyjh Inserted Code -----
             # Save a replay video of the episode
-            save_rollout_video(
-                replay_images, total_episodes, success=done, task_description=task_description, log_file=log_file
+            finalize_rollout_video(
+                video_writer,
+                video_path,
+                total_episodes,
+                success=done,
+                task_description=task_description,
+                log_file=log_file,
             )
 
             # Log current results
@@ -377,6 +383,11 @@ def eval_libero(cfg: GenerateConfig) -> None:
             # ----- End of qyjh Inserted Code -----
             log_file.flush()
 
+        # ----- Begin of qyjh Inserted Code -----
+        with open(task_log_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        # ----- End of qyjh Inserted Code -----
+
         # Log final results
         print(f"Current task success rate: {float(task_successes) / float(task_episodes)}")
         print(f"Current total success rate: {float(total_successes) / float(total_episodes)}")
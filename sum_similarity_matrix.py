@@ -1,4 +1,3 @@
-import torch
 import os
 import json
 import pdb
@@ -10,24 +9,26 @@ def plot_similarity_heatmap(sim_matrix, title="Similarity Heatmap", save_path=No
     绘制相似度矩阵的热图
 
     参数:
-        sim_matrix (torch.Tensor): 相似度矩阵
+        sim_matrix (np.ndarray): 相似度矩阵
         title (str): 热图的标题
     """
-    sim_matrix_np = sim_matrix.cpu().numpy()
-    plt.figure(figsize=(16,12))
-    plt.imshow(sim_matrix_np, cmap='viridis', vmin=0, vmax=1) 
-    plt.colorbar(label="Similarity") 
-    plt.title(title)
+    sim_matrix_np = np.asarray(sim_matrix)
+    fig, ax = plt.subplots(figsize=(16,12))
+    im = ax.imshow(sim_matrix_np, cmap='viridis', vmin=0, vmax=1)
+    fig.colorbar(im, ax=ax, label="Similarity")
+    ax.set_title(title)
     
     n = sim_matrix_np.shape[0]
-    plt.xticks(np.arange(n), labels=[f"Tensor {i+1}" for i in range(n)])
-    plt.yticks(np.arange(n), labels=[f"Tensor {i+1}" for i in range(n)])
+    tick_labels = [f"Tensor {i+1}" for i in range(n)]
+    ax.set_xticks(np.arange(n), labels=tick_labels)
+    ax.set_yticks(np.arange(n), labels=tick_labels)
 
-    for i in range(n):
-        for j in range(n):
-            plt.text(j, i, f"{sim_matrix_np[i, j]:.2f}", ha="center", va="center", color="white")
-    plt.savefig(save_path)
-    plt.close()
+    # 批量格式化所有单元格标注, 并直接在 Axes 上绘制 (避免每个单元格经过 pyplot 状态机)
+    cell_labels = np.char.mod("%.2f", sim_matrix_np)
+    for (i, j), label in np.ndenumerate(cell_labels):
+        ax.text(j, i, label, ha="center", va="center", color="white")
+    fig.savefig(save_path)
+    plt.close(fig)
 
 dir_name = os.path.dirname(__file__)
 similarity_matrix_path = os.path.join(dir_name, "similarity_figures")
@@ -38,13 +39,17 @@ for action_id in range(0, 7):
 for task_name in os.listdir(similarity_matrix_path):
     task_path = os.path.join(similarity_matrix_path, task_name)
     
-    accumulated_similarity_matrix = torch.zeros(32, 32)
+    accumulated_similarity_matrix = np.zeros((32, 32), dtype=np.float32)
     for id, file_name in enumerate(file_list):
         json_matrix_path = os.path.join(task_path, file_name)
 
         with open(json_matrix_path, "r") as f:
             data = json.load(f)
-            accumulated_similarity_matrix += torch.tensor(data["average_matrix"])
+            np.add(
+                accumulated_similarity_matrix,
+                np.asarray(data["average_matrix"], dtype=np.float32),
+                out=accumulated_similarity_matrix,
+            )
         
         # if id == 0:
         #     accumulated_similarity_matrix *= 40